@@ -1,11 +1,13 @@
 #!/usr/bin/env -S uv run
 import argparse
-import io
 import os
 import random
+import re
 import shlex
 import subprocess
+import sys
 import tomllib
+from collections import Counter
 from datetime import date, datetime
 from importlib import metadata
 from pathlib import Path
@@ -15,20 +17,38 @@ import chess.pgn
 import chess.polyglot
 import chess.engine
 
-from .engines.andoma.movegeneration import next_move as andoma_gen
-from .engines.sunfish import sunfish_uci
-from .engines.sunfish.tools import uci
+# The engines are imported on first use so that starting the CLI (or just
+# asking for help) doesn't pay for their module setup.
+andoma_gen = None
+sunfish_uci = None
+uci = None
+
+
+def _load_andoma():
+    global andoma_gen
+    if andoma_gen is None:
+        from .engines.andoma.movegeneration import next_move as andoma_gen
+    return andoma_gen
+
+
+def _load_sunfish():
+    global sunfish_uci, uci
+    if sunfish_uci is None:
+        from .engines.sunfish import sunfish_uci
+        from .engines.sunfish.tools import uci
+    return sunfish_uci, uci
 
 
 # --- Colors (ANSI) ------------------------------------------------------------
 # Works in most terminals. On Windows, ANSI is supported in modern terminals;
 # if you need broader support, install `colorama` and it will be used if present.
-try:
-    import colorama  # type: ignore
+def _init_colorama():
+    try:
+        import colorama  # type: ignore
 
-    colorama.just_fix_windows_console()
-except Exception:
-    pass
+        colorama.just_fix_windows_console()
+    except Exception:
+        pass
 
 
 class Style:
@@ -45,6 +65,11 @@ class Style:
 
 
 def c(text: str, *styles: str) -> str:
+    # nearly every call passes one or two styles
+    if len(styles) == 1:
+        return f"{styles[0]}{text}{Style.RESET}"
+    if len(styles) == 2:
+        return f"{styles[0]}{styles[1]}{text}{Style.RESET}"
     return "".join(styles) + text + Style.RESET
 
 
@@ -77,6 +102,12 @@ def _format_version() -> str:
 
 
 # --- Game logic --------------------------------------------------------------
+ANDOMA_DEPTH = 4
+BOOK_MAX_MOVE = 15  # last full move on which the opening book is consulted
+COLOR_NAME = ("black", "white")  # indexed by chess.Color
+UCI_LIMIT_STEPS = 5  # think times drawn from, spread over [half, full]
+
+
 class Game:
     def __init__(
         self,
@@ -97,20 +128,79 @@ class Game:
         self.verbose = verbose
         self.book_path = book_path
         self.book_chance = book_chance
+        # probed once so games without a book skip the lookup entirely
+        self.has_book = book_path is not None and os.path.exists(book_path)
+        # set once the book can no longer be used in this game
+        self.book_done = not self.has_book
+        # None = not opened yet, False = no usable book
+        self.book_reader: chess.polyglot.MemoryMappedReader | None | bool = None
         self.uci_think_time = uci_think_time
-        self.turn = chess.WHITE  # whose turn it is to move in our bookkeeping
-        self.count = 0  # move number (full moves)
-        self.pgn_text = ""
+        self.uci_limits = tuple(
+            chess.engine.Limit(
+                time=uci_think_time * (1 + i / (UCI_LIMIT_STEPS - 1)) / 2
+            )
+            for i in range(UCI_LIMIT_STEPS)
+        )
+        self.rng = random.Random()
+        me, bot = "Me", f"{engine_name} Bot"
+        white, black = (me, bot) if player_color == chess.WHITE else (bot, me)
+        self.pgn_headers = {
+            "Event": "Blind-chess match",
+            "Site": "Terminal",
+            "White": white,
+            "Black": black,
+            "Date": date.today().isoformat(),
+        }
+        # (PGN comment, result) for a checkmate by either side
+        self.player_mates = (
+            f"{COLOR_NAME[player_color]} wins by checkmate.",
+            "1-0" if player_color == chess.WHITE else "0-1",
+        )
+        self.engine_mates = (
+            f"{COLOR_NAME[not player_color]} wins by checkmate.",
+            "0-1" if player_color == chess.WHITE else "1-0",
+        )
+        self.pgn_game = chess.pgn.Game()
+        self.pgn_node: chess.pgn.GameNode = self.pgn_game  # last recorded move
+        # Polyglot hash of the current position, refreshed once per ply
+        self.zobrist_key = chess.polyglot.zobrist_hash(self.board)
+        # zobrist hash -> number of times the position occurred this game
+        self.repetitions: Counter[int] = Counter([self.zobrist_key])
         self.ended = False
-
-    def reset(self):
-        self.board.set_fen(chess.STARTING_FEN)
-        self.turn = chess.WHITE
-        self.count = 0
-        self.pgn_text = ""
+        # sunfish positions for every ply, built on the first sunfish search
+        self.sunfish_hist: list | None = None
+        # SAN listing of the legal moves, built on demand and cleared on push
+        self.moves_san: str | None = None
+
+    def reset(self, fen: str = chess.STARTING_FEN):
+        self.board.set_fen(fen)
+        self.pgn_game = chess.pgn.Game()
+        self.pgn_game.setup(self.board)
+        self.pgn_node = self.pgn_game
+        self.zobrist_key = chess.polyglot.zobrist_hash(self.board)
+        self.repetitions = Counter([self.zobrist_key])
         self.ended = False
+        self.book_done = not self.has_book
+        self.sunfish_hist = None
+        self.moves_san = None
+        self.close_book()
+
+    def book(self) -> chess.polyglot.MemoryMappedReader | None:
+        """Open the opening book on first use and keep it for the whole game."""
+        if self.book_reader is None:
+            try:
+                self.book_reader = chess.polyglot.open_reader(self.book_path)
+            except OSError:
+                self.book_reader = False
+        return self.book_reader or None
+
+    def close_book(self):
+        if self.book_reader:
+            self.book_reader.close()
+        self.book_reader = None
 
     def close_engine(self):
+        self.close_book()
         if self.engine is None:
             return
         try:
@@ -123,116 +213,194 @@ class Game:
         self.engine = None
 
 
-def is_a_draw(board: chess.Board):
-    """Return (is_draw, message)."""
-    if board.is_stalemate():
-        return True, "Stalemate"
-    elif board.is_insufficient_material():
-        return True, "Insufficient Material"
-    elif board.can_claim_fifty_moves():
-        return True, "Fifty-move rule"
-    elif board.can_claim_threefold_repetition():
-        return True, "Threefold repetition"
-    return False, ""
-
-
-def bool_color_to_string(color_b: chess.Color) -> str:
-    return "white" if color_b == chess.WHITE else "black"
-
-
-def finalize_pgn(pgn_str: str, player_color: chess.Color, engine_name: str):
-    final_pgn = pgn_str + "\n\n"
-    game_pgn = chess.pgn.read_game(io.StringIO(final_pgn))
-    game_pgn.headers["Event"] = "Blind-chess match"
-    game_pgn.headers["Site"] = "Terminal"
-    if player_color == chess.WHITE:
-        game_pgn.headers["White"] = "Me"
-        game_pgn.headers["Black"] = f"{engine_name} Bot"
+DRAW_REASONS = {
+    "stalemate": "Stalemate",
+    "insufficient": "Insufficient Material",
+    "fifty": "Fifty-move rule",
+    "threefold": "Threefold repetition",
+}
+
+
+def terminal_state(
+    board: chess.Board,
+    repetitions: Counter[int] | None = None,
+    key: int | None = None,
+) -> str | None:
+    """Return "checkmate", a DRAW_REASONS key, or None if play goes on.
+
+    Threefold repetition means the current position has occurred three times.
+    ``repetitions`` counts the Zobrist keys of the game's positions so far;
+    when given, it is consulted instead of replaying the move stack. ``key``
+    is the board's Zobrist key if the caller already has it.
+    """
+    # one legal-move scan decides both checkmate and stalemate
+    if not any(board.generate_legal_moves()):
+        return "checkmate" if board.is_check() else "stalemate"
+    if board.is_insufficient_material():
+        return "insufficient"
+    # a fifty-move claim needs at least 99 reversible half-moves
+    if board.halfmove_clock >= 99 and board.can_claim_fifty_moves():
+        return "fifty"
+    # a repetition needs at least eight reversible half-moves
+    if board.halfmove_clock < 8:
+        return None
+    if repetitions is None:
+        repeated = board.is_repetition(3)
     else:
-        game_pgn.headers["White"] = f"{engine_name} Bot"
-        game_pgn.headers["Black"] = "Me"
-    game_pgn.headers["Date"] = date.today().isoformat()
+        if key is None:
+            key = chess.polyglot.zobrist_hash(board)
+        repeated = repetitions[key] >= 3
+    return "threefold" if repeated else None
+
+
+def is_a_draw(board: chess.Board, repetitions: Counter[int] | None = None):
+    """Return (is_draw, message)."""
+    reason = DRAW_REASONS.get(terminal_state(board, repetitions))
+    if reason is None:
+        return False, ""
+    return True, reason
+
+
+def finalize_pgn(game: Game) -> chess.pgn.Game:
+    game_pgn = game.pgn_game
+    game_pgn.headers.update(game.pgn_headers)
     return game_pgn
 
 
-def bot_makes_a_move(game: Game):
-    board = game.board
-    move = random.choice(list(board.legal_moves))
-    used_book = False
+def _push_move(game: Game, move: chess.Move):
+    """Play a move on the game board and keep the PGN and engine state in sync."""
+    game.board.push(move)
+    _record_move(game, move)
 
-    if game.engine_kind == "andoma":
-        move = andoma_gen(depth=4, board=board, debug=False)
-    elif game.engine_kind == "sunfish":
-        position = uci.from_fen(*board.fen().split())
-        current_hist = (
+
+def _record_move(game: Game, move: chess.Move):
+    """Update the game's bookkeeping for a move just pushed on its board."""
+    game.pgn_node = game.pgn_node.add_variation(move)
+    game.zobrist_key = chess.polyglot.zobrist_hash(game.board)
+    game.repetitions[game.zobrist_key] += 1
+    game.moves_san = None
+    if game.sunfish_hist is not None:
+        hist = game.sunfish_hist
+        hist.append(hist[-1].move(uci.parse_move(move.uci(), len(hist) % 2 == 1)))
+
+
+def _end_game(game: Game, comment: str, result: str):
+    """Mark the game as over and record how it ended in the PGN."""
+    game.pgn_node.comment = comment
+    game.pgn_game.headers["Result"] = result
+    game.ended = True
+
+
+def _sunfish_hist(game: Game) -> list:
+    """Return the shortest sunfish history ending in the current position."""
+    if game.sunfish_hist is None:
+        _load_sunfish()
+        position = uci.from_fen(*game.board.fen().split())
+        game.sunfish_hist = (
             [position]
             if uci.get_color(position) == uci.WHITE
             else [position.rotate(), position]
         )
-        total_time = random.randint(10, 60)
-        _, uci_move_str = sunfish_uci.generate_move(current_hist, total_time)
-        move = chess.Move.from_uci(uci_move_str)
-    elif game.engine_kind == "uci":
+    hist = game.sunfish_hist
+    # sunfish infers the side to move from the parity of the history length
+    return hist[-1:] if len(hist) % 2 == 1 else hist[-2:]
+
+
+def _book_move(
+    board: chess.Board,
+    reader: chess.polyglot.MemoryMappedReader,
+    rng: random.Random,
+) -> chess.Move | None:
+    """Pick a book move for the position, weighted like Polyglot's own choice."""
+    entries = list(reader.find_all(board))
+    if not entries:
+        return None
+    weights = [entry.weight for entry in entries]
+    return rng.choices(entries, weights=weights)[0].move
+
+
+def _random_move(board: chess.Board, rng: random.Random) -> chess.Move:
+    moves = list(board.legal_moves)
+    return moves[rng.randrange(len(moves))]
+
+
+def _andoma_move(board: chess.Board) -> chess.Move:
+    return _load_andoma()(depth=ANDOMA_DEPTH, board=board, debug=False)
+
+
+def _sunfish_move(hist: list, total_time: int) -> chess.Move:
+    _, uci_move_str = _load_sunfish()[0].generate_move(hist, total_time)
+    return chess.Move.from_uci(uci_move_str)
+
+
+def _roll_book(game: Game) -> chess.Move | None:
+    """Decide whether the opening book answers this move, and with what."""
+    if game.book_done:
+        return None
+    board = game.board
+    if board.fullmove_number > BOOK_MAX_MOVE:
+        game.book_done = True
+        return None
+    if game.rng.random() >= game.book_chance:
+        return None
+    reader = game.book()
+    return _book_move(board, reader, game.rng) if reader is not None else None
+
+
+def _engine_move(game: Game) -> chess.Move | None:
+    """Get the engine's move, or None if the engine failed and the game ended."""
+    board = game.board
+    if game.engine_kind == "random":
+        return _random_move(board, game.rng)
+    if game.engine_kind == "andoma":
+        return _andoma_move(board)
+    if game.engine_kind == "sunfish":
+        return _sunfish_move(_sunfish_hist(game), game.rng.randint(10, 60))
+    if game.engine_kind == "uci":
         if game.engine is None:
             raise RuntimeError("UCI engine is not initialized.")
-        think_time = random.uniform(game.uci_think_time / 2, game.uci_think_time)
         try:
-            result = game.engine.play(board, chess.engine.Limit(time=think_time))
-            move = result.move
+            return game.engine.play(board, game.rng.choice(game.uci_limits)).move
         except (TimeoutError, chess.engine.EngineTerminatedError) as e:
             print(c(f"Engine error: {e} — ending game.", Style.RED))
             game.ended = True
-            return
+            return None
+    raise ValueError(f"Unknown engine kind: {game.engine_kind!r}")
 
-    # optional opening book
-    roll = random.random()
-    if game.book_path and game.count < 15 and roll < game.book_chance:
-        try:
-            with chess.polyglot.open_reader(game.book_path) as reader:
-                move = reader.weighted_choice(board).move
-                used_book = True
-        except (IndexError, FileNotFoundError):
-            pass
 
-    turn_number = board.fullmove_number
-    move_san = board.san(move)
-    board.push(move)
+def bot_makes_a_move(game: Game):
+    board = game.board
+    move = _roll_book(game)
+    used_book = move is not None
+    if not used_book:
+        move = _engine_move(game)
+        if move is None:
+            return
 
-    if game.turn == chess.WHITE:
-        game.count += 1
-        game.pgn_text += f"\n{game.count}. {move_san}"
-    else:
-        game.pgn_text += f" {move_san}"
+    turn_number = board.fullmove_number
+    # the SAN suffix is worked out on the pushed board, so push only once
+    move_san = board.san_and_push(move)
+    _record_move(game, move)
 
-    # Minimal engine output (colored, no label)
+    # Minimal engine output (colored, no label), written out in one go
     turn_prefix = c(f"{turn_number}.", Style.DIM)
+    line = f"{turn_prefix} {c(move_san, Style.MAGENTA, Style.BOLD)}"
     if game.verbose and used_book:
-        print(
-            f"{turn_prefix} {c(move_san, Style.MAGENTA, Style.BOLD)}"
-            f"{c(' (book)', Style.DIM)}"
-        )
-    else:
-        print(f"{turn_prefix} {c(move_san, Style.MAGENTA, Style.BOLD)}")
+        line += c(" (book)", Style.DIM)
+    out = [line]
 
     # draw / checkmate handling
-    check_draw, draw_type = is_a_draw(board)
-    if check_draw:
-        print(c(f"Draw: {draw_type}", Style.YELLOW, Style.BOLD))
-        game.pgn_text += " { The game is a draw. } 1/2-1/2"
-        game.ended = True
-        return
-
-    if board.is_checkmate():
-        print(c("Checkmate.", Style.RED, Style.BOLD))
-        result = "0-1" if game.player_color == chess.WHITE else "1-0"
-        game.pgn_text += (
-            f" {{ {bool_color_to_string(not game.player_color)} wins by checkmate. }} "
-            f"{result}"
-        )
-        game.ended = True
-        return
+    state = terminal_state(board, game.repetitions, game.zobrist_key)
+    if state in DRAW_REASONS:
+        out.append(c(f"Draw: {DRAW_REASONS[state]}", Style.YELLOW, Style.BOLD))
+        _end_game(game, "The game is a draw.", "1/2-1/2")
+    elif state == "checkmate":
+        out.append(c("Checkmate.", Style.RED, Style.BOLD))
+        _end_game(game, *game.engine_mates)
 
-    game.turn = not game.turn
+    out.append("")
+    sys.stdout.write("\n".join(out))
+    sys.stdout.flush()
 
 
 def _engine_display_name(command: str, engine: chess.engine.SimpleEngine) -> str:
@@ -261,27 +429,115 @@ def _book_status_line(book_path: str | None, book_chance: float) -> str:
     return "Opening book: none"
 
 
+_READLINE = False
+# readline must be told that color codes take no room on screen
+_ESCAPE_CODE = re.compile(r"(\033\[[0-9;]*m)")
+
+
+def _init_readline():
+    """Give interactive prompts line editing and history where available."""
+    global _READLINE
+    try:
+        import readline  # noqa: F401
+    except ImportError:
+        return
+    _READLINE = True
+
+
+def _read_line(prompt: str, eof: str = "") -> str:
+    """Prompt and read one line from stdin; return ``eof`` at end of input."""
+    # input() only uses readline when both ends are a terminal; otherwise it
+    # would write the \001/\002 markers straight into the output
+    if _READLINE and sys.stdin.isatty() and sys.stdout.isatty():
+        try:
+            return input(_ESCAPE_CODE.sub("\001\\1\002", prompt))
+        except EOFError:
+            return eof
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        return eof
+    return line.rstrip("\n")
+
+
 _CANCEL = {"back", "cancel", "q"}
 
+_PROMPT_MAIN = c("> ", Style.DIM)
+_PROMPT_ENGINE = c("engine> ", Style.DIM)
+_PROMPT_UCI = c("uci engine path/command> ", Style.DIM)
+_PROMPT_COLOR = c("color> ", Style.DIM)
+
+
+# --- Menus (styled once at import) ---------------------------------------------
+_ENGINE_OPTIONS = ["random", "andoma", "sunfish", "uci"]
+# menu number or name -> engine kind
+_ENGINE_MAP = {
+    **{name: name for name in _ENGINE_OPTIONS},
+    **{str(i): name for i, name in enumerate(_ENGINE_OPTIONS, start=1)},
+}
+# menu number or name -> colors to pick from
+_COLOR_MAP: dict[str, tuple[chess.Color, ...]] = {
+    "1": (chess.WHITE,),
+    "white": (chess.WHITE,),
+    "2": (chess.BLACK,),
+    "black": (chess.BLACK,),
+    "3": (chess.WHITE, chess.BLACK),
+    "random": (chess.WHITE, chess.BLACK),
+}
+_CHOOSE_ENGINE_TEXT = "\n".join(
+    [
+        c("Choose engine:", Style.CYAN, Style.BOLD),
+        *(
+            f"  {c(str(i) + '.', Style.DIM)} {c(name, Style.CYAN)}"
+            for i, name in enumerate(_ENGINE_OPTIONS, start=1)
+        ),
+        c("  (back/cancel to return to lobby)", Style.DIM),
+    ]
+)
+_CHOOSE_COLOR_TEXT = "\n".join(
+    [
+        c("Choose your color:", Style.CYAN, Style.BOLD),
+        f"  {c('1.', Style.DIM)} {c('white', Style.CYAN)}",
+        f"  {c('2.', Style.DIM)} {c('black', Style.CYAN)}",
+        f"  {c('3.', Style.DIM)} {c('random', Style.CYAN)}",
+        c("  (back/cancel to go back)", Style.DIM),
+    ]
+)
+_HELP_TEXT = "\n".join(
+    [
+        c("Lobby:", Style.CYAN, Style.BOLD),
+        f"  {c('start', Style.CYAN)}  start a new game",
+        f"  {c('quick', Style.CYAN)}  start with sunfish + random color",
+        f"  {c('help', Style.CYAN)}   show this help",
+        f"  {c('version', Style.CYAN)} show program version",
+        f"  {c('quit', Style.CYAN)}   quit",
+        "",
+        c("In-game:", Style.CYAN, Style.BOLD),
+        f"  {c('show', Style.CYAN)}   show the board",
+        f"  {c('moves', Style.CYAN)}  show legal moves (SAN)",
+        f"  {c('fen', Style.CYAN)}    show FEN",
+        f"  {c('pgn', Style.CYAN)}    show PGN so far",
+        f"  {c('resign', Style.CYAN)} resign the game",
+        "",
+        c("Or type a move in SAN, e.g. e4, Nf3, exd5, a8=Q.", Style.DIM),
+    ]
+)
+
 
 def choose_engine() -> tuple[str, str, chess.engine.SimpleEngine | None] | None:
-    options = ["random", "andoma", "sunfish", "uci"]
-    print(c("Choose engine:", Style.CYAN, Style.BOLD))
-    for i, name in enumerate(options, start=1):
-        print(f"  {c(str(i) + '.', Style.DIM)} {c(name, Style.CYAN)}")
-    print(c("  (back/cancel to return to lobby)", Style.DIM))
+    sys.stdout.write(_CHOOSE_ENGINE_TEXT + "\n")
     while True:
-        choice = input(c("engine> ", Style.DIM)).strip().lower()
+        choice = _read_line(_PROMPT_ENGINE, eof="cancel").strip().lower()
         if choice in _CANCEL:
             return None
-        if choice in {"1", "2", "3", "4"}:
-            choice = options[int(choice) - 1]
-        if choice in options:
-            if choice != "uci":
-                return choice, choice, None
+        kind = _ENGINE_MAP.get(choice)
+        if kind is not None:
+            if kind != "uci":
+                return kind, kind, None
             print(c("  (back/cancel to go back)", Style.DIM))
             while True:
-                cmd = input(c("uci engine path/command> ", Style.DIM)).strip()
+                cmd = _read_line(_PROMPT_UCI, eof="back").strip()
                 if cmd.lower() in _CANCEL:
                     break
                 engine = _spawn_uci_engine(cmd)
@@ -294,40 +550,19 @@ def choose_engine() -> tuple[str, str, chess.engine.SimpleEngine | None] | None:
 
 
 def choose_color() -> chess.Color | None:
-    print(c("Choose your color:", Style.CYAN, Style.BOLD))
-    print(f"  {c('1.', Style.DIM)} {c('white', Style.CYAN)}")
-    print(f"  {c('2.', Style.DIM)} {c('black', Style.CYAN)}")
-    print(f"  {c('3.', Style.DIM)} {c('random', Style.CYAN)}")
-    print(c("  (back/cancel to go back)", Style.DIM))
+    sys.stdout.write(_CHOOSE_COLOR_TEXT + "\n")
     while True:
-        choice = input(c("color> ", Style.DIM)).strip().lower()
+        choice = _read_line(_PROMPT_COLOR, eof="cancel").strip().lower()
         if choice in _CANCEL:
             return None
-        if choice in {"1", "white"}:
-            return chess.WHITE
-        if choice in {"2", "black"}:
-            return chess.BLACK
-        if choice in {"3", "random"}:
-            return random.choice([chess.WHITE, chess.BLACK])
+        colors = _COLOR_MAP.get(choice)
+        if colors is not None:
+            return colors[0] if len(colors) == 1 else random.choice(colors)
         print(c("Invalid choice.", Style.RED))
 
 
 def print_help():
-    print(c("Lobby:", Style.CYAN, Style.BOLD))
-    print(f"  {c('start', Style.CYAN)}  start a new game")
-    print(f"  {c('quick', Style.CYAN)}  start with sunfish + random color")
-    print(f"  {c('help', Style.CYAN)}   show this help")
-    print(f"  {c('version', Style.CYAN)} show program version")
-    print(f"  {c('quit', Style.CYAN)}   quit")
-    print()
-    print(c("In-game:", Style.CYAN, Style.BOLD))
-    print(f"  {c('show', Style.CYAN)}   show the board")
-    print(f"  {c('moves', Style.CYAN)}  show legal moves (SAN)")
-    print(f"  {c('fen', Style.CYAN)}    show FEN")
-    print(f"  {c('pgn', Style.CYAN)}    show PGN so far")
-    print(f"  {c('resign', Style.CYAN)} resign the game")
-    print()
-    print(c("Or type a move in SAN, e.g. e4, Nf3, exd5, a8=Q.", Style.DIM))
+    sys.stdout.write(_HELP_TEXT + "\n")
 
 
 def parse_command(s: str):
@@ -340,6 +575,182 @@ def parse_command(s: str):
     return s.lower()
 
 
+def _begin_game(
+    args: argparse.Namespace,
+    engine_kind: str,
+    engine_name: str,
+    engine: chess.engine.SimpleEngine | None,
+    player_color: chess.Color,
+) -> Game:
+    game = Game(
+        engine_kind,
+        engine_name,
+        player_color,
+        engine=engine,
+        verbose=args.verbose,
+        book_path=args.book,
+        book_chance=args.book_chance,
+        uci_think_time=args.think_time,
+    )
+
+    print()
+    print(
+        c("You:", Style.DIM)
+        + " "
+        + c(COLOR_NAME[player_color], Style.CYAN, Style.BOLD)
+        + c(" vs ", Style.DIM)
+        + c(engine_name, Style.CYAN, Style.BOLD)
+    )
+    print(c(_book_status_line(args.book, args.book_chance), Style.DIM))
+    print(c("Tip: type 'show' to display the board.", Style.DIM))
+    print()
+
+    # If the engine is white, let it move first.
+    if player_color == chess.BLACK:
+        bot_makes_a_move(game)
+    return game
+
+
+# --- Lobby commands: take the parsed CLI args, return the new game (if any) ---
+def _lobby_start(args: argparse.Namespace) -> Game | None:
+    result = choose_engine()
+    if result is None:
+        return None
+    engine_kind, engine_name, engine = result
+    player_color = choose_color()
+    if player_color is None:
+        if engine is not None:
+            try:
+                engine.quit()
+            except Exception:
+                pass
+        return None
+    return _begin_game(args, engine_kind, engine_name, engine, player_color)
+
+
+def _lobby_quick(args: argparse.Namespace) -> Game:
+    player_color = random.choice([chess.WHITE, chess.BLACK])
+    return _begin_game(args, "sunfish", "sunfish", None, player_color)
+
+
+def _lobby_help(args: argparse.Namespace) -> None:
+    print_help()
+    print()
+
+
+def _lobby_version(args: argparse.Namespace) -> None:
+    print(_format_version())
+    print()
+
+
+LOBBY_DISPATCH = {
+    "start": _lobby_start,
+    "quick": _lobby_quick,
+    "help": _lobby_help,
+    "version": _lobby_version,
+}
+
+
+# --- In-game commands ---------------------------------------------------------
+def _cmd_help(game: Game):
+    print_help()
+
+
+def _cmd_show(game: Game):
+    print(game.board)
+
+
+def legal_moves_san(board: chess.Board) -> list[str]:
+    """SAN of every legal move, identical to ``board.san`` for each of them.
+
+    Legal moves are generated once; while streaming them, the origin squares
+    of piece moves are bucketed by piece type and target square for
+    disambiguation. Only moves that give check are pushed to tell ``+`` from
+    ``#``.
+    """
+    moves: list[tuple[chess.Move, int]] = []
+    origins: dict[tuple[int, int], int] = {}
+    for move in board.generate_legal_moves():
+        piece_type = board.piece_type_at(move.from_square)
+        moves.append((move, piece_type))
+        # pawns are never disambiguated and there is only one king
+        if piece_type != chess.PAWN and piece_type != chess.KING:
+            key = (piece_type, move.to_square)
+            origins[key] = origins.get(key, 0) | chess.BB_SQUARES[move.from_square]
+
+    sans = []
+    for move, piece_type in moves:
+        from_square, to_square = move.from_square, move.to_square
+        if piece_type == chess.KING and board.is_castling(move):
+            san = "O-O-O" if to_square < from_square else "O-O"
+        elif piece_type == chess.PAWN:
+            san = ""
+            if board.is_capture(move):
+                san = chess.FILE_NAMES[chess.square_file(from_square)] + "x"
+            san += chess.SQUARE_NAMES[to_square]
+            if move.promotion:
+                san += "=" + chess.piece_symbol(move.promotion).upper()
+        else:
+            san = chess.piece_symbol(piece_type).upper()
+            others = origins.get((piece_type, to_square), 0)
+            others &= ~chess.BB_SQUARES[from_square]
+            if others:
+                # same rules as chess.Board.san: file if it is enough, else rank,
+                # else both
+                from_file = chess.square_file(from_square)
+                from_rank = chess.square_rank(from_square)
+                if not others & chess.BB_FILES[from_file]:
+                    san += chess.FILE_NAMES[from_file]
+                elif not others & chess.BB_RANKS[from_rank]:
+                    san += chess.RANK_NAMES[from_rank]
+                else:
+                    san += chess.SQUARE_NAMES[from_square]
+            if board.is_capture(move):
+                san += "x"
+            san += chess.SQUARE_NAMES[to_square]
+        if board.gives_check(move):
+            board.push(move)
+            san += "+" if any(board.generate_legal_moves()) else "#"
+            board.pop()
+        sans.append(san)
+    return sans
+
+
+def _cmd_moves(game: Game):
+    if game.moves_san is None:
+        game.moves_san = " ".join(legal_moves_san(game.board))
+    print(game.moves_san)
+
+
+def _cmd_fen(game: Game):
+    print(game.board.fen())
+
+
+def _cmd_pgn(game: Game):
+    print(finalize_pgn(game))
+
+
+def _cmd_resign(game: Game):
+    print(c("Resigned.", Style.YELLOW, Style.BOLD))
+    result = "0-1" if game.player_color == chess.WHITE else "1-0"
+    _end_game(game, f"{COLOR_NAME[game.player_color]} resigns.", result)
+
+
+def _cmd_start(game: Game):
+    print(c("Game in progress. Finish or resign first.", Style.RED))
+
+
+IN_GAME_DISPATCH = {
+    "help": _cmd_help,
+    "show": _cmd_show,
+    "moves": _cmd_moves,
+    "fen": _cmd_fen,
+    "pgn": _cmd_pgn,
+    "resign": _cmd_resign,
+    "start": _cmd_start,
+}
+
+
 def _parse_player_move(board: chess.Board, user_in: str) -> chess.Move | None:
     try:
         move = board.parse_san(user_in)
@@ -352,8 +763,9 @@ def _parse_player_move(board: chess.Board, user_in: str) -> chess.Move | None:
 
 def ask_yes_no(prompt: str, default_no: bool = True) -> bool:
     suffix = " [y/N]: " if default_no else " [Y/n]: "
+    styled = c(prompt + suffix, Style.DIM)
     while True:
-        ans = input(c(prompt + suffix, Style.DIM)).strip().lower()
+        ans = _read_line(styled).strip().lower()
         if not ans:
             return not default_no
         if ans in {"y", "yes"}:
@@ -376,8 +788,9 @@ def _slugify_filename(text: str) -> str:
 def ask_pgn_action() -> str:
     prompt = "Final PGN: (p)rint, (s)ave, or (n)one?"
     suffix = " [n]: "
+    styled = c(prompt + suffix, Style.DIM)
     while True:
-        ans = input(c(prompt + suffix, Style.DIM)).strip().lower()
+        ans = _read_line(styled).strip().lower()
         if not ans:
             return "none"
         if ans in {"p", "print"}:
@@ -471,14 +884,15 @@ def _analyze_pgn_with_stockfish(
 def ask_stockfish_command() -> str:
     prompt = "Stockfish command/path"
     suffix = " [stockfish]: "
-    return input(c(prompt + suffix, Style.DIM)).strip()
+    return _read_line(c(prompt + suffix, Style.DIM)).strip()
 
 
 def ask_analysis_report() -> str:
     prompt = "Post-game analysis: (s)tats, (a)ccuracy, (w)orst move, (f)ull, or (n)one?"
     suffix = " [n]: "
+    styled = c(prompt + suffix, Style.DIM)
     while True:
-        ans = input(c(prompt + suffix, Style.DIM)).strip().lower()
+        ans = _read_line(styled).strip().lower()
         if not ans:
             return "none"
         if ans in {"s", "stats"}:
@@ -554,6 +968,8 @@ def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
 
 def main(argv: list[str] | None = None):
     args = _parse_args(argv)
+    _init_colorama()
+    _init_readline()
     print(c("\nBlindfold Chess\n", Style.BOLD))
     print_help()
     print()
@@ -563,10 +979,8 @@ def main(argv: list[str] | None = None):
     while True:
         # If a game ended, optionally print PGN, then return to lobby.
         if game is not None and game.ended:
-            if game.pgn_text:
-                final_pgn = finalize_pgn(
-                    game.pgn_text, game.player_color, game.engine_name
-                )
+            if game.pgn_game.variations or game.pgn_game.comment:
+                final_pgn = finalize_pgn(game)
                 action = ask_pgn_action()
                 if action == "print":
                     print()
@@ -632,91 +1046,14 @@ def main(argv: list[str] | None = None):
 
         # No active game: only limited commands work.
         if game is None:
-            user_in = input(c("> ", Style.DIM)).strip()
+            user_in = _read_line(_PROMPT_MAIN, eof="quit").strip()
             if not user_in:
                 continue
 
             cmd = parse_command(user_in)
-            if cmd == "start":
-                result = choose_engine()
-                if result is None:
-                    continue
-                engine_kind, engine_name, engine = result
-                player_color = choose_color()
-                if player_color is None:
-                    if engine is not None:
-                        try:
-                            engine.quit()
-                        except Exception:
-                            pass
-                    continue
-                game = Game(
-                    engine_kind,
-                    engine_name,
-                    player_color,
-                    engine=engine,
-                    verbose=args.verbose,
-                    book_path=args.book,
-                    book_chance=args.book_chance,
-                    uci_think_time=args.think_time,
-                )
-
-                print()
-                print(
-                    c("You:", Style.DIM)
-                    + " "
-                    + c(bool_color_to_string(player_color), Style.CYAN, Style.BOLD)
-                    + c(" vs ", Style.DIM)
-                    + c(engine_name, Style.CYAN, Style.BOLD)
-                )
-                print(c(_book_status_line(args.book, args.book_chance), Style.DIM))
-                print(c("Tip: type 'show' to display the board.", Style.DIM))
-                print()
-
-                # If the engine is white, let it move first.
-                if player_color == chess.BLACK:
-                    bot_makes_a_move(game)
-                continue
-
-            if cmd == "quick":
-                engine_kind = "sunfish"
-                engine_name = "sunfish"
-                engine = None
-                player_color = random.choice([chess.WHITE, chess.BLACK])
-                game = Game(
-                    engine_kind,
-                    engine_name,
-                    player_color,
-                    engine=engine,
-                    verbose=args.verbose,
-                    book_path=args.book,
-                    book_chance=args.book_chance,
-                    uci_think_time=args.think_time,
-                )
-
-                print()
-                print(
-                    c("You:", Style.DIM)
-                    + " "
-                    + c(bool_color_to_string(player_color), Style.CYAN, Style.BOLD)
-                    + c(" vs ", Style.DIM)
-                    + c(engine_name, Style.CYAN, Style.BOLD)
-                )
-                print(c(_book_status_line(args.book, args.book_chance), Style.DIM))
-                print(c("Tip: type 'show' to display the board.", Style.DIM))
-                print()
-
-                if player_color == chess.BLACK:
-                    bot_makes_a_move(game)
-                continue
-
-            if cmd == "help":
-                print_help()
-                print()
-                continue
-            if cmd == "version":
-                print(_format_version())
-                print()
+            handler = LOBBY_DISPATCH.get(cmd)
+            if handler is not None:
+                game = handler(args)
                 continue
 
             if cmd == "quit":
@@ -739,37 +1076,20 @@ def main(argv: list[str] | None = None):
             continue
 
         turn_prompt = f"{game.board.fullmove_number}> "
-        user_in = input(c(turn_prompt, Style.DIM)).strip()
+        user_in = _read_line(c(turn_prompt, Style.DIM), eof="quit").strip()
         if not user_in:
             continue
 
         cmd = parse_command(user_in)
 
         # Known in-game commands
-        if cmd in {"help", "show", "moves", "fen", "pgn", "resign", "quit", "start"}:
-            if cmd == "help":
-                print_help()
-            elif cmd == "show":
-                print(game.board)
-            elif cmd == "moves":
-                moves_in_uci = list(game.board.legal_moves)
-                moves_in_san = [game.board.san(m) for m in moves_in_uci]
-                print(" ".join(moves_in_san))
-            elif cmd == "fen":
-                print(game.board.fen())
-            elif cmd == "pgn":
-                print(finalize_pgn(game.pgn_text, game.player_color, game.engine_name))
-            elif cmd == "resign":
-                print(c("Resigned.", Style.YELLOW, Style.BOLD))
-                result = "0-1" if game.player_color == chess.WHITE else "1-0"
-                game.pgn_text += f" {{ {bool_color_to_string(game.player_color)} resigns. }} {result}"
-                game.ended = True
-            elif cmd == "quit":
-                print(c("Goodbye.", Style.DIM))
-                game.close_engine()
-                break
-            elif cmd == "start":
-                print(c("Game in progress. Finish or resign first.", Style.RED))
+        if cmd == "quit":
+            print(c("Goodbye.", Style.DIM))
+            game.close_engine()
+            break
+        handler = IN_GAME_DISPATCH.get(cmd)
+        if handler is not None:
+            handler(game)
             continue
 
         # Otherwise, try to interpret it as a move in SAN
@@ -778,35 +1098,21 @@ def main(argv: list[str] | None = None):
             print(c("Illegal move / unknown command.", Style.RED))
             continue
 
-        game.board.push(move)
+        _push_move(game, move)
 
         # Optional: extremely subtle acknowledgement (comment out if you want *zero* noise)
         # print(c("✓", Style.GREEN, Style.DIM))
 
-        if game.turn == chess.WHITE:
-            game.count += 1
-            game.pgn_text += f"\n{game.count}. {user_in}"
-        else:
-            game.pgn_text += f" {user_in}"
-
-        check_draw, draw_type = is_a_draw(game.board)
-        if check_draw:
-            print(c(f"Draw: {draw_type}", Style.YELLOW, Style.BOLD))
-            game.pgn_text += " { The game is a draw. } 1/2-1/2"
-            game.ended = True
+        state = terminal_state(game.board, game.repetitions, game.zobrist_key)
+        if state in DRAW_REASONS:
+            print(c(f"Draw: {DRAW_REASONS[state]}", Style.YELLOW, Style.BOLD))
+            _end_game(game, "The game is a draw.", "1/2-1/2")
             continue
 
-        if game.board.is_checkmate():
+        if state == "checkmate":
             print(c("Checkmate. You win.", Style.GREEN, Style.BOLD))
-            result = "1-0" if game.player_color == chess.WHITE else "0-1"
-            game.pgn_text += (
-                f" {{ {bool_color_to_string(game.player_color)} wins by checkmate. }} "
-                f"{result}"
-            )
-            game.ended = True
+            _end_game(game, *game.player_mates)
             continue
-
-        game.turn = not game.turn
         # engine will move in the next iteration
 
 
@@ -2,6 +2,8 @@ from datetime import date
 from pathlib import Path
 
 import chess
+import chess.engine
+import chess.polyglot
 import pytest
 
 from ch0 import cli
@@ -27,7 +29,7 @@ def make_game(
 
 
 def force_choice(monkeypatch: pytest.MonkeyPatch, move: chess.Move) -> None:
-    monkeypatch.setattr(cli.random, "choice", lambda _: move)
+    monkeypatch.setattr(cli, "_random_move", lambda _board, _rng: move)
 
 
 def test_bot_makes_a_move_updates_pgn_and_turn(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -38,41 +40,44 @@ def test_bot_makes_a_move_updates_pgn_and_turn(monkeypatch: pytest.MonkeyPatch)
     cli.bot_makes_a_move(game)
 
     assert game.board.peek() == move
-    assert game.count == 1
-    assert game.turn == chess.BLACK
-    assert "\n1. e4" in game.pgn_text
+    assert game.board.turn == chess.BLACK
+    assert game.pgn_node.move == move
+    assert "1. e4" in str(cli.finalize_pgn(game))
 
 
 def test_bot_makes_a_move_appends_black_move(monkeypatch: pytest.MonkeyPatch) -> None:
     game = make_game()
-    game.board.push_san("e4")
-    game.turn = chess.BLACK
-    game.count = 1
-    game.pgn_text = "\n1. e4"
+    cli._push_move(game, game.board.parse_san("e4"))
     move = chess.Move.from_uci("e7e5")
     force_choice(monkeypatch, move)
 
     cli.bot_makes_a_move(game)
 
-    assert game.count == 1
-    assert game.pgn_text.endswith(" e5")
+    assert game.board.fullmove_number == 2
+    assert "1. e4 e5" in str(cli.finalize_pgn(game))
 
 
-def test_bot_makes_a_move_sets_draw(monkeypatch: pytest.MonkeyPatch) -> None:
+def test_bot_makes_a_move_sets_draw(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
     game = make_game()
-    game.board = chess.Board("7k/8/8/8/8/8/8/7K w - - 0 1")
+    game.reset("7k/8/8/8/8/8/8/7K w - - 0 1")
     move = next(iter(game.board.legal_moves))
     force_choice(monkeypatch, move)
 
     cli.bot_makes_a_move(game)
 
     assert game.ended is True
-    assert "The game is a draw" in game.pgn_text
+    assert game.pgn_node.comment == "The game is a draw."
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert "Draw: Insufficient Material" in lines[1]
+    assert game.pgn_game.headers["Result"] == "1/2-1/2"
 
 
 def test_bot_makes_a_move_sets_checkmate(monkeypatch: pytest.MonkeyPatch) -> None:
     game = make_game(player_color=chess.WHITE)
-    game.board = chess.Board("7k/5Q2/7K/8/8/8/8/8 w - - 0 1")
+    game.reset("7k/5Q2/7K/8/8/8/8/8 w - - 0 1")
     mate_move = chess.Move.from_uci("f7g7")
     assert any(mate_move == move for move in game.board.legal_moves)
     force_choice(monkeypatch, mate_move)
@@ -81,7 +86,157 @@ def test_bot_makes_a_move_sets_checkmate(monkeypatch: pytest.MonkeyPatch) -> Non
 
     assert game.ended is True
     assert game.board.is_checkmate()
-    assert "black wins by checkmate" in game.pgn_text
+    assert "black wins by checkmate" in str(cli.finalize_pgn(game))
+
+
+def write_book(path: Path, board: chess.Board, move: chess.Move) -> None:
+    raw_move = move.to_square | (move.from_square << 6)
+    entry = chess.polyglot.ENTRY_STRUCT.pack(
+        chess.polyglot.zobrist_hash(board), raw_move, 1, 0
+    )
+    path.write_bytes(entry)
+
+
+def test_bot_makes_a_move_loads_book_once(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    book = tmp_path / "book.bin"
+    write_book(book, chess.Board(), chess.Move.from_uci("d2d4"))
+    opened = []
+    real_open = chess.polyglot.open_reader
+
+    def counting_open(path):
+        opened.append(path)
+        return real_open(path)
+
+    monkeypatch.setattr(cli.chess.polyglot, "open_reader", counting_open)
+    game = make_game(book_path=str(book), book_chance=1.0)
+
+    cli.bot_makes_a_move(game)
+    cli.bot_makes_a_move(game)
+
+    assert game.board.move_stack[0] == chess.Move.from_uci("d2d4")
+    assert opened == [str(book)]
+
+    reader = game.book_reader
+    game.close_engine()
+    assert game.book_reader is None
+    assert reader.mmap.closed
+
+
+def test_unreadable_book_is_retried_by_the_next_game(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    book = tmp_path / "book.bin"
+    write_book(book, chess.Board(), chess.Move.from_uci("d2d4"))
+    real_open = chess.polyglot.open_reader
+
+    def failing_open(path):
+        raise OSError("locked")
+
+    monkeypatch.setattr(cli.chess.polyglot, "open_reader", failing_open)
+    assert make_game(book_path=str(book)).book() is None
+
+    monkeypatch.setattr(cli.chess.polyglot, "open_reader", real_open)
+    game = make_game(book_path=str(book))
+    assert game.book() is not None
+    game.close_engine()
+
+
+def test_game_without_book_file_skips_lookup(monkeypatch: pytest.MonkeyPatch) -> None:
+    game = make_game(book_path="missing.bin", book_chance=1.0)
+    assert game.has_book is False
+
+    monkeypatch.setattr(
+        cli.chess.polyglot, "open_reader", lambda _p: pytest.fail("probed")
+    )
+    cli.bot_makes_a_move(game)
+    assert len(game.board.move_stack) == 1
+
+
+def test_book_is_skipped_after_opening(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    book = tmp_path / "book.bin"
+    write_book(book, chess.Board(), chess.Move.from_uci("d2d4"))
+    game = make_game(book_path=str(book), book_chance=1.0)
+    game.reset(f"4k3/8/8/8/8/8/8/4K2R w K - 0 {cli.BOOK_MAX_MOVE + 1}")
+
+    monkeypatch.setattr(
+        cli.chess.polyglot, "open_reader", lambda _p: pytest.fail("probed")
+    )
+    cli.bot_makes_a_move(game)
+    assert game.book_done is True
+
+    game.reset()
+    assert game.book_done is False
+
+
+def test_bot_makes_a_move_searches_with_andoma(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    game = make_game(player_color=chess.BLACK, engine_kind="andoma")
+    searched = []
+
+    def fake_andoma(depth: int, board: chess.Board, debug: bool) -> chess.Move:
+        searched.append(board.fen())
+        return chess.Move.from_uci("g1f3")
+
+    monkeypatch.setattr(cli, "andoma_gen", fake_andoma)
+    cli.bot_makes_a_move(game)
+
+    assert game.board.peek() == chess.Move.from_uci("g1f3")
+    assert searched == [chess.STARTING_FEN]
+
+
+def test_book_move_skips_the_engine_search(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    book = tmp_path / "book.bin"
+    write_book(book, chess.Board(), chess.Move.from_uci("d2d4"))
+    game = make_game(
+        player_color=chess.BLACK,
+        engine_kind="andoma",
+        book_path=str(book),
+        book_chance=1.0,
+    )
+    monkeypatch.setattr(cli, "andoma_gen", lambda **_kw: pytest.fail("searched"))
+    cli.bot_makes_a_move(game)
+
+    assert game.board.peek() == chess.Move.from_uci("d2d4")
+
+
+def test_uci_engine_plays_with_a_pooled_limit() -> None:
+    game = make_game(player_color=chess.BLACK, engine_kind="uci")
+    limits = []
+
+    class FakeEngine:
+        def play(self, board: chess.Board, limit: chess.engine.Limit):
+            limits.append(limit)
+            return chess.engine.PlayResult(chess.Move.from_uci("e2e4"), None)
+
+    game.engine = FakeEngine()
+    cli.bot_makes_a_move(game)
+
+    times = [limit.time for limit in game.uci_limits]
+    assert min(times) == game.uci_think_time / 2
+    assert max(times) == game.uci_think_time
+    assert len(limits) == 1 and limits[0] in game.uci_limits
+    assert game.board.peek() == chess.Move.from_uci("e2e4")
+
+
+def test_push_move_keeps_sunfish_history_in_sync() -> None:
+    game = make_game(engine_kind="sunfish", engine_name="sunfish")
+    cli._sunfish_hist(game)
+
+    for san in ["e4", "d5", "exd5", "Qxd5", "Nc3"]:
+        cli._push_move(game, game.board.parse_san(san))
+
+    expected = cli.uci.from_fen(*game.board.fen().split())
+    current_hist = cli._sunfish_hist(game)
+    assert len(current_hist) == 2
+    assert current_hist[-1].board == expected.board
+    assert current_hist[-1].score == expected.score
 
 
 def test_is_a_draw_stalemate() -> None:
@@ -117,10 +272,51 @@ def test_is_a_draw_threefold_repetition() -> None:
     assert reason == "Threefold repetition"
 
 
+def test_terminal_state() -> None:
+    mate = chess.Board("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1")
+    stalemate = chess.Board("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+
+    assert cli.terminal_state(chess.Board()) is None
+    assert cli.terminal_state(mate) == "checkmate"
+    assert cli.terminal_state(stalemate) == "stalemate"
+
+
+def test_is_a_draw_uses_game_repetitions() -> None:
+    game = make_game()
+    repeat = ["g1f3", "g8f6", "f3g1", "f6g8"]
+    for uci in repeat:
+        cli._push_move(game, chess.Move.from_uci(uci))
+    assert cli.is_a_draw(game.board, game.repetitions) == (False, "")
+
+    for uci in repeat:
+        cli._push_move(game, chess.Move.from_uci(uci))
+    assert game.zobrist_key == chess.polyglot.zobrist_hash(game.board)
+    assert game.repetitions[game.zobrist_key] == 3
+    assert cli.is_a_draw(game.board, game.repetitions) == (
+        True,
+        "Threefold repetition",
+    )
+
+
+def test_terminal_state_uses_the_given_key(monkeypatch: pytest.MonkeyPatch) -> None:
+    game = make_game()
+    for uci in ["g1f3", "g8f6", "f3g1", "f6g8"] * 2:
+        cli._push_move(game, chess.Move.from_uci(uci))
+
+    monkeypatch.setattr(cli.chess.polyglot, "zobrist_hash", lambda _b: pytest.fail())
+    state = cli.terminal_state(game.board, game.repetitions, game.zobrist_key)
+    assert state == "threefold"
+
+
 def test_finalize_pgn_headers() -> None:
-    game_pgn = cli.finalize_pgn("1. e4 e5", chess.WHITE, "sunfish")
+    game = make_game(engine_name="sunfish")
+    for san in ["e4", "e5"]:
+        cli._push_move(game, game.board.parse_san(san))
+
+    game_pgn = cli.finalize_pgn(game)
     headers = game_pgn.headers
 
+    assert [move.uci() for move in game_pgn.mainline_moves()] == ["e2e4", "e7e5"]
     assert headers["Event"] == "Blind-chess match"
     assert headers["Site"] == "Terminal"
     assert headers["White"] == "Me"
@@ -128,6 +324,40 @@ def test_finalize_pgn_headers() -> None:
     assert headers["Date"] == date.today().isoformat()
 
 
+@pytest.mark.parametrize(
+    "fen",
+    [
+        chess.STARTING_FEN,
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "7k/1P4Q1/8/8/8/2N3N1/8/R3K2R w KQ - 0 1",
+        "8/2k5/8/3R4/8/8/8/R3K3 w Q - 0 1",
+        "4k3/8/8/8/1N3N2/8/1N3N2/4K3 w - - 0 1",
+        "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1",
+        "4k3/4r3/8/8/8/8/4N3/1N2K3 w - - 0 1",
+    ],
+)
+def test_legal_moves_san_matches_board_san(fen: str) -> None:
+    board = chess.Board(fen)
+    expected = [board.san(move) for move in board.legal_moves]
+    assert cli.legal_moves_san(board) == expected
+    assert board.fen() == fen
+
+
+def test_cmd_moves_caches_listing_until_next_move(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    game = make_game()
+    cli._cmd_moves(game)
+    assert game.moves_san is not None
+    assert "Nf3" in capsys.readouterr().out
+
+    cli._push_move(game, game.board.parse_san("e4"))
+    assert game.moves_san is None
+
+    cli._cmd_moves(game)
+    assert "e5" in capsys.readouterr().out.split()
+
+
 def test_parse_command_and_slugify() -> None:
     assert cli.parse_command(":show") == "show"
     assert cli.parse_command("  MoVes ") == "moves"
@@ -1,13 +1,15 @@
+import io
 from types import SimpleNamespace
 
+import chess
 import pytest
 
 from ch0 import cli
 
 
 def feed_inputs(monkeypatch: pytest.MonkeyPatch, inputs: list[str]) -> None:
-    iterator = iter(inputs)
-    monkeypatch.setattr("builtins.input", lambda _: next(iterator))
+    text = "".join(f"{line}\n" for line in inputs)
+    monkeypatch.setattr("sys.stdin", io.StringIO(text))
 
 
 def test_ask_yes_no_defaults_and_retries(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -36,6 +38,22 @@ def test_ask_analysis_report_defaults_and_retries(
     assert cli.ask_analysis_report() == "full"
 
 
+def test_choose_engine_and_color_accept_numbers_and_names(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    feed_inputs(monkeypatch, ["5", "2"])
+    assert cli.choose_engine() == ("andoma", "andoma", None)
+
+    feed_inputs(monkeypatch, ["Sunfish"])
+    assert cli.choose_engine() == ("sunfish", "sunfish", None)
+
+    feed_inputs(monkeypatch, ["purple", "black"])
+    assert cli.choose_color() == chess.BLACK
+
+    feed_inputs(monkeypatch, ["1"])
+    assert cli.choose_color() == chess.WHITE
+
+
 def test_engine_display_name_falls_back_to_command() -> None:
     engine = SimpleNamespace(id={"name": "Stockfish"})
     assert cli._engine_display_name("stockfish", engine) == "Stockfish"
@@ -75,6 +93,16 @@ def test_main_start_resign_quit(
     assert "Goodbye." in out
 
 
+def test_main_quits_at_end_of_input(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    feed_inputs(monkeypatch, ["help"])
+
+    cli.main([])
+
+    assert "Goodbye." in capsys.readouterr().out
+
+
 def test_main_lobby_version(
     monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
 ) -> None:
@@ -86,3 +114,38 @@ def test_main_lobby_version(
     out = capsys.readouterr().out
     assert "ch0 9.9.9" in out
     assert "Goodbye." in out
+
+
+def test_read_line_uses_input_on_a_terminal(monkeypatch: pytest.MonkeyPatch) -> None:
+    class Terminal(io.StringIO):
+        def isatty(self) -> bool:
+            return True
+
+    prompts = []
+
+    def fake_input(prompt: str) -> str:
+        prompts.append(prompt)
+        raise EOFError
+
+    monkeypatch.setattr("sys.stdin", Terminal())
+    monkeypatch.setattr("sys.stdout", Terminal())
+    monkeypatch.setattr(cli, "_READLINE", True)
+    monkeypatch.setattr("builtins.input", fake_input)
+
+    assert cli._read_line(cli._PROMPT_MAIN, eof="quit") == "quit"
+    assert prompts == ["\001\033[2m\002> \001\033[0m\002"]
+
+
+def test_read_line_keeps_piped_output_plain(monkeypatch: pytest.MonkeyPatch) -> None:
+    class Terminal(io.StringIO):
+        def isatty(self) -> bool:
+            return True
+
+    out = io.StringIO()
+    monkeypatch.setattr("sys.stdin", Terminal("e4\n"))
+    monkeypatch.setattr("sys.stdout", out)
+    monkeypatch.setattr(cli, "_READLINE", True)
+    monkeypatch.setattr("builtins.input", lambda _p: pytest.fail("used input()"))
+
+    assert cli._read_line(cli._PROMPT_MAIN) == "e4"
+    assert out.getvalue() == cli._PROMPT_MAIN